@@ -1,90 +1,357 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, Index, text
-from app.core.dependencies import get_async_db, get_redis
-from app.schemas.product import ProductQuery, PaginatedProducts, ProductOut
+from sqlalchemy import select, func, Index, literal_column, tuple_, lambda_stmt
+from app.core.dependencies import get_async_db
+from app.db.base import AsyncSessionLocal
+from app.core.cache import get_from_cache, queue_cache_write, unpack_body
+from app.core.config import settings
+from app.schemas.product import ProductQuery, PaginatedProducts
 from app.models.product import Product
 from redis.asyncio import Redis
-import msgpack
+import orjson
+import base64
+from blake3 import blake3
+from cachetools import TTLCache
 from datetime import datetime, timedelta
 import asyncio
-from typing import Dict, Any, List, Optional, Tuple
+import logging
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple, Callable, Awaitable
 from pydantic import ValidationError
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-# Improved cache configuration
-CACHE_TTL_SECONDS = 600
-CACHE_PREFIX = "products:"
-REDIS_TIMEOUT = 3.0  # Increased timeout for Redis operations
-
-# Custom msgpack handlers for datetime objects
-def encode_datetime(obj):
-    if isinstance(obj, datetime):
-        return {"__datetime__": True, "value": obj.isoformat()}
-    return obj
-
-def decode_datetime(obj):
-    if isinstance(obj, dict) and obj.get("__datetime__"):
-        return datetime.fromisoformat(obj["value"])
-    return obj
-
-# Simplified cache key generation for better performance
-def generate_cache_key(query_params: Dict[str, Any]) -> str:
-    # Extract only the parameters that affect the query results
-    key_parts = [
-        f"p{query_params.get('page', 1)}",
-        f"l{query_params.get('limit', 50)}",
-        f"s{query_params.get('sort_by', 'id')}",
-        f"d{query_params.get('sort_order', 'asc')}"
-    ]
-    
-    # Add optional filters only if they exist
-    if category := query_params.get('category'):
-        key_parts.append(f"c{category}")
-    
-    if search := query_params.get('search'):
-        key_parts.append(f"q{search}")
-    
-    # Build compact key
-    return f"{CACHE_PREFIX}{'_'.join(key_parts)}"
+# Improved cache configuration. Counts only depend on the filters, so they
+# are shared by every page and sort order and can be kept for longer.
+CACHE_TTL_SECONDS = settings.CACHE_TTL_SECONDS
+COUNT_CACHE_TTL_SECONDS = settings.COUNT_CACHE_TTL_SECONDS
+CACHE_PREFIX = "products:v3:"  # v3: cached bodies carry their generation time
+
+# Pages older than CACHE_TTL_SECONDS are still served from Redis while a
+# background refresh replaces them (stale-while-revalidate); they are only
+# dropped once they reach this age.
+CACHE_STALE_TTL_SECONDS = CACHE_TTL_SECONDS * 4
+
+# Per-worker cache in front of Redis for the hottest pages. The short TTL
+# bounds how stale a worker can get, since nothing invalidates it across
+# workers. Only touched from the event loop thread, so no locking is needed.
+LOCAL_CACHE_TTL_SECONDS = 30
+local_cache: TTLCache = TTLCache(maxsize=512, ttl=LOCAL_CACHE_TTL_SECONDS)
+
+# Database loads currently in flight, keyed by cache key (see single_flight)
+_inflight: Dict[str, asyncio.Future] = {}
+
+# Strong references to background refreshes so they aren't garbage collected
+_refresh_tasks: Set[asyncio.Task] = set()
+
+# Search terms containing these are matched with ILIKE instead of full-text search
+SEARCH_WILDCARDS = ("%", "_")
+
+# The text search config must be rendered inline rather than as a bound
+# parameter, otherwise Postgres can't match the products_name_fts index
+TS_CONFIG = literal_column("'english'")
+
+# Columns returned to the client, in ProductOut field order
+PRODUCT_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.description,
+    Product.price,
+    Product.category,
+    Product.stock_quantity,
+    Product.created_at,
+    Product.updated_at,
+)
+
+# Sortable columns, keyed by the values ProductQuery.sort_by accepts
+SORT_COLUMNS = {
+    "id": Product.id,
+    "name": Product.name,
+    "price": Product.price,
+    "category": Product.category,
+    "stock_quantity": Product.stock_quantity,
+    "created_at": Product.created_at,
+    "updated_at": Product.updated_at,
+}
 
-async def get_from_cache(redis_client: Redis, cache_key: str) -> Optional[bytes]:
-    """Get data from cache with optimized error handling"""
+# Fixed-length cache key: a 16-byte BLAKE3 digest of the parameters that
+# affect the query results, instead of embedding them in the key itself
+def generate_cache_key(query: ProductQuery) -> str:
+    canonical = (
+        f"{query.page}|{query.limit}|{query.sort_by}|{query.sort_order}|"
+        f"{query.category or ''}|{query.search or ''}|{query.after or ''}"
+    )
+    return f"{CACHE_PREFIX}{blake3(canonical.encode()).hexdigest(length=16)}"
+
+def generate_count_cache_key(query: ProductQuery) -> str:
+    canonical = f"{query.category or ''}|{query.search or ''}"
+    return f"{CACHE_PREFIX}count:{blake3(canonical.encode()).hexdigest(length=16)}"
+
+# Keyset cursors are base64url-encoded JSON [sort_by, sort_value, id] taken
+# from the last row of a page. The sort field is embedded so a cursor can't
+# be replayed against a different ordering.
+def encode_cursor(sort_by: str, value: Any, last_id: int) -> str:
+    raw = orjson.dumps([sort_by, value, last_id])
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str, sort_by: str) -> Tuple[Any, int]:
+    """Return (sort_value, id) from a cursor, raising ValueError if it is invalid"""
     try:
-        return await asyncio.wait_for(
-            redis_client.get(cache_key),
-            timeout=REDIS_TIMEOUT
-        )
-    except (asyncio.TimeoutError, Exception):
-        # Simplified error handling - just return None on any error
-        return None
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        field, value, last_id = orjson.loads(raw)
+        python_type = SORT_COLUMNS[sort_by].type.python_type
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        else:
+            value = python_type(value)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+    if field != sort_by or not isinstance(last_id, int):
+        raise ValueError("Cursor does not match the requested sort order")
+
+    return value, last_id
+
+# Statements are assembled from lambda_stmt pieces so SQLAlchemy caches both
+# their construction and the compiled SQL per filter/sort shape. Lambdas only
+# close over plain values, which become bound parameters, or over columns,
+# which become part of the cache key; never over the ProductQuery itself.
+
+def seek_after(stmt, order_column, descending: bool, cursor: Tuple[Any, int]):
+    """
+    Resume a keyset scan right after the cursor row.
+
+    Assumes the sort column is non-NULL (true for all seeded products); a NULL
+    sort value can't be compared against and such rows would be skipped.
+    """
+    value, last_id = cursor
+    if order_column is Product.id:
+        if descending:
+            stmt += lambda s: s.where(Product.id < last_id)
+        else:
+            stmt += lambda s: s.where(Product.id > last_id)
+    elif descending:
+        stmt += lambda s: s.where(tuple_(order_column, Product.id) < tuple_(value, last_id))
+    else:
+        stmt += lambda s: s.where(tuple_(order_column, Product.id) > tuple_(value, last_id))
+    return stmt
+
+def apply_filters(stmt, query: ProductQuery):
+    """Apply the category/search filters shared by the page and count queries"""
+    category = query.category
+    search = query.search
+
+    if category:
+        stmt += lambda s: s.where(Product.category == category)
+
+    if search:
+        if any(c in search for c in SEARCH_WILDCARDS):
+            # Explicit wildcards only make sense as a pattern match; lower()
+            # on both sides lets it use the products_name_trgm index
+            pattern = f"%{search.lower()}%"
+            stmt += lambda s: s.where(func.lower(Product.name).like(pattern))
+        else:
+            # Must match the indexed expression exactly for the GIN index to be used
+            stmt += lambda s: s.where(
+                func.to_tsvector(TS_CONFIG, Product.name).op("@@")(
+                    func.plainto_tsquery(TS_CONFIG, search)
+                )
+            )
+
+    return stmt
+
+def apply_ordering(stmt, order_column, descending: bool):
+    """Sort by the requested column, with id as a tie-breaker"""
+    if order_column is Product.id:
+        if descending:
+            stmt += lambda s: s.order_by(Product.id.desc())
+        else:
+            stmt += lambda s: s.order_by(Product.id.asc())
+    elif descending:
+        stmt += lambda s: s.order_by(order_column.desc(), Product.id.desc())
+    else:
+        stmt += lambda s: s.order_by(order_column.asc(), Product.id.asc())
+    return stmt
+
+async def load_products(
+    db: AsyncSession,
+    redis_client: Optional[Redis],
+    query: ProductQuery,
+    cursor: Optional[Tuple[Any, int]],
+    cache_key: str
+) -> bytes:
+    """Query a page of products, cache it and return the serialized JSON body"""
+    offset = (query.page - 1) * query.limit
+    order_column = SORT_COLUMNS[query.sort_by]
+    descending = query.sort_order == "desc"
+
+    total_count = None
+    if cursor is None:
+        count_key = generate_count_cache_key(query)
+        cached_count = await get_from_cache(redis_client, count_key)
+        if cached_count is not None:
+            total_count = int(cached_count)
+
+    if cursor is not None:
+        # Keyset pagination: seek past the cursor row through the ordering
+        # index instead of walking and discarding OFFSET rows. No COUNT is
+        # run; one extra row is fetched to tell whether a next page exists.
+        limit = query.limit + 1
+        stmt = lambda_stmt(lambda: select(*PRODUCT_COLUMNS))
+        stmt = seek_after(apply_filters(stmt, query), order_column, descending, cursor)
+        stmt += lambda s: s.limit(limit)
+    else:
+        limit = query.limit
+        if total_count is not None:
+            stmt = lambda_stmt(lambda: select(*PRODUCT_COLUMNS))
+        else:
+            # Count and page are fetched in a single round trip: COUNT(*)
+            # OVER () is evaluated before LIMIT/OFFSET, so every row
+            # carries the total size of the filtered set.
+            stmt = lambda_stmt(
+                lambda: select(*PRODUCT_COLUMNS, func.count().over().label("_total"))
+            )
+        stmt = apply_filters(stmt, query)
+        stmt += lambda s: s.offset(offset).limit(limit)
+
+    # Apply sorting, with id as a tie-breaker so pages are stable and
+    # every row has a unique position for the cursor
+    stmt = apply_ordering(stmt, order_column, descending)
+
+    # Execute query
+    result = await db.execute(stmt)
+    rows = result.mappings().all()
+
+    if cursor is not None:
+        has_next = len(rows) > query.limit
+        rows = rows[:query.limit]
+    else:
+        if total_count is None:
+            # A separate COUNT is only needed when the requested page
+            # lies past the end and no rows come back
+            if rows:
+                total_count = rows[0]["_total"]
+            elif offset:
+                count_stmt = apply_filters(
+                    lambda_stmt(lambda: select(func.count()).select_from(Product)), query
+                )
+                result = await db.execute(count_stmt)
+                total_count = result.scalar()
+            else:
+                total_count = 0
+
+            queue_cache_write(
+                count_key, str(total_count).encode(), COUNT_CACHE_TTL_SECONDS, compress=False
+            )
+        has_next = offset + len(rows) < total_count
+
+    # Prepare response data straight from the row mappings; the columns
+    # already match ProductOut, so no per-row model is built. asyncpg returns
+    # timestamps as datetime objects, which orjson serializes directly.
+    product_data = [{k: v for k, v in row.items() if k != "_total"} for row in rows]
+
+    response_data = {
+        "data": product_data,
+        "total_count": total_count,
+        "page": query.page,
+        "limit": query.limit,
+        "has_next": has_next,
+        # Page-based responses carry a cursor too, so clients can switch
+        # to keyset pagination from any page
+        "next_cursor": encode_cursor(
+            query.sort_by, product_data[-1][query.sort_by], product_data[-1]["id"]
+        ) if has_next else None
+    }
+
+    body = orjson.dumps(response_data)
+    local_cache[cache_key] = body
+
+    # Compression and the Redis write happen in the background cache writers
+    queue_cache_write(cache_key, body, CACHE_STALE_TTL_SECONDS)
 
-async def set_to_cache(redis_client: Redis, cache_key: str, value: bytes, ttl: int) -> None:
-    """Set data to cache without waiting for result"""
+    return body
+
+async def single_flight(key: str, load: Callable[[], Awaitable[bytes]]) -> bytes:
+    """
+    Coalesce concurrent loads of the same key: the first caller runs load()
+    and everyone arriving while it is in flight awaits the same result.
+    """
+    fut = _inflight.get(key)
+    if fut is not None:
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            if not fut.cancelled():
+                # This request itself was cancelled
+                raise
+            # The leading request went away before finishing; take over
+            return await single_flight(key, load)
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[key] = fut
+    try:
+        result = await load()
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as e:
+        fut.set_exception(e)
+        # Mark the exception as retrieved in case nobody else was waiting
+        fut.exception()
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        del _inflight[key]
+
+async def refresh_products(
+    redis_client: Optional[Redis],
+    query: ProductQuery,
+    cursor: Optional[Tuple[Any, int]],
+    cache_key: str
+) -> None:
+    """Rebuild a stale cache entry outside of any request"""
+    if cache_key in _inflight:
+        return
     try:
-        await redis_client.set(cache_key, value, ex=ttl)
-    except Exception:
-        # Silently continue on error - caching is a performance optimization, not critical
-        pass
+        # The request's own session is closed once its response is sent
+        async with AsyncSessionLocal() as db:
+            await single_flight(
+                cache_key, lambda: load_products(db, redis_client, query, cursor, cache_key)
+            )
+    except Exception as e:
+        # The stale entry keeps being served until a refresh succeeds
+        logger.warning("Background refresh of %s failed: %s", cache_key, e)
 
-@router.get("/products", response_model=PaginatedProducts)
+@router.get(
+    "/products",
+    response_model=None,
+    responses={200: {"model": PaginatedProducts}}
+)
 async def get_products(
     request: Request,
-    response: Response,
     db: AsyncSession = Depends(get_async_db),
-    redis_client: Redis = Depends(get_redis),
     page: int = 1,
     limit: int = 50,
     sort_by: str = "id",
     sort_order: str = "asc",
     category: str = None,
-    search: str = None
-):
+    search: str = None,
+    after: str = None
+) -> Response:
     """
     Get paginated list of products with optional filtering - optimized version.
+
+    The JSON body is built once and cached as bytes, so cache hits skip
+    model validation and response serialization entirely.
     """
-    start_time = datetime.now()
+    start_time = time.perf_counter_ns()
+    # The shared client set up by redis_lifespan, read directly instead of
+    # through a dependency. None without Redis, or if the lifespan never ran.
+    redis_client: Optional[Redis] = getattr(request.app.state, "redis", None)
     
     try:
         # Create and validate the query parameters
@@ -95,7 +362,8 @@ async def get_products(
                 sort_by=sort_by,
                 sort_order=sort_order,
                 category=category,
-                search=search
+                search=search,
+                after=after
             )
         except ValidationError as e:
             error_details = []
@@ -109,166 +377,74 @@ async def get_products(
                 detail=f"Invalid query parameters: {'; '.join(error_details)}"
             )
 
-        # Set default cache status
-        response.headers["X-Cache"] = "MISS"
-        
+        cursor = None
+        if query.after is not None:
+            try:
+                cursor = decode_cursor(query.after, query.sort_by)
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid query parameters: after: {e}"
+                )
+
         # Generate optimized cache key
-        cache_key = generate_cache_key(query.model_dump())
+        cache_key = generate_cache_key(query)
+        
+        # Hot pages are served from this worker's memory without touching Redis
+        body = local_cache.get(cache_key)
+        if body is not None:
+            # Add timing information
+            process_time = (time.perf_counter_ns() - start_time) / 1e6
+            return Response(
+                content=body,
+                media_type="application/json",
+                headers={"X-Cache": "HIT", "X-Process-Time-Ms": f"{process_time:.2f}"}
+            )
         
         # Try to get data from cache first - skip connection check to improve performance
         cached_data = await get_from_cache(redis_client, cache_key)
         
         if cached_data:
             try:
-                # Deserialize with msgpack
-                unpacked_data = msgpack.unpackb(cached_data, object_hook=decode_datetime)
-                result = PaginatedProducts.model_validate(unpacked_data)
-                response.headers["X-Cache"] = "HIT"
-                
-                # Add timing information
-                process_time = (datetime.now() - start_time).total_seconds() * 1000
-                response.headers["X-Process-Time-Ms"] = f"{process_time:.2f}"
-                
-                return result
+                body, generated_at = unpack_body(cached_data)
             except Exception:
-                # Continue to fetch from DB on deserialization error
-                pass
-        
-        # Optimize database query with raw SQL for performance
-        # This is more efficient for large datasets than the ORM approach
-        if query.search:
-            # If search is provided, use a more optimized query with ILIKE
-            search_term = f"%{query.search}%"
-            
-            # For count
-            count_sql = """
-            SELECT COUNT(*) 
-            FROM products 
-            WHERE 1=1
-            """
-            count_params = {}
-            
-            if query.category:
-                count_sql += " AND category = :category"
-                count_params['category'] = query.category
-                
-            if query.search:
-                count_sql += " AND name ILIKE :search"
-                count_params['search'] = search_term
-                
-            count_result = await db.execute(text(count_sql), count_params)
-            total_count = count_result.scalar()
-            
-            # For data
-            data_sql = """
-            SELECT id, name, description, price, category, stock_quantity, created_at, updated_at
-            FROM products
-            WHERE 1=1
-            """
-            data_params = {}
-            
-            if query.category:
-                data_sql += " AND category = :category"
-                data_params['category'] = query.category
-                
-            if query.search:
-                data_sql += " AND name ILIKE :search"
-                data_params['search'] = search_term
-            
-            # Add sorting
-            data_sql += f" ORDER BY {query.sort_by} {query.sort_order.upper()}"
-            
-            # Add pagination
-            offset = (query.page - 1) * query.limit
-            data_sql += " LIMIT :limit OFFSET :offset"
-            data_params['limit'] = query.limit
-            data_params['offset'] = offset
+                # Continue to fetch from DB on a corrupt entry
+                body = None
             
-            # Execute the query
-            result = await db.execute(text(data_sql), data_params)
-            products = result.mappings().all()
-            
-        else:
-            # If no search, use the ORM approach which is more readable and maintainable
-            # Build database query
-            stmt = select(Product)
-            
-            # Apply filters
-            if query.category:
-                stmt = stmt.where(Product.category == query.category)
-                
-            # Apply sorting
-            try:
-                order_column = getattr(Product, query.sort_by)
-                if query.sort_order == "desc":
-                    stmt = stmt.order_by(order_column.desc())
+            if body is not None:
+                if time.time() - generated_at > CACHE_TTL_SECONDS:
+                    # Serve the stale page now and refresh it in the background
+                    cache_status = "STALE"
+                    task = asyncio.create_task(
+                        refresh_products(redis_client, query, cursor, cache_key)
+                    )
+                    _refresh_tasks.add(task)
+                    task.add_done_callback(_refresh_tasks.discard)
                 else:
-                    stmt = stmt.order_by(order_column.asc())
-            except AttributeError:
-                # If sort field doesn't exist, use default sorting
-                stmt = stmt.order_by(Product.id.asc())
+                    cache_status = "HIT"
+                    local_cache[cache_key] = body
                 
-            # Get total count for pagination metadata
-            count_stmt = select(func.count()).select_from(Product)
-            if query.category:
-                count_stmt = count_stmt.where(Product.category == query.category)
-            
-            # Execute count query
-            result = await db.execute(count_stmt)
-            total_count = result.scalar()
-            
-            # Apply pagination
-            offset = (query.page - 1) * query.limit
-            stmt = stmt.offset(offset).limit(query.limit)
-            
-            # Execute query
-            result = await db.execute(stmt)
-            products = result.scalars().all()
-        
-        # Prepare response data
-        if isinstance(products, list) and products and hasattr(products[0], '__table__'):
-            # Handle ORM objects
-            product_data = [ProductOut.model_validate(product).model_dump() for product in products]
-        else:
-            # Handle raw SQL results (mappings)
-            product_data = [dict(p) for p in products]
-            # Convert datetime objects properly
-            for p in product_data:
-                if 'created_at' in p and p['created_at']:
-                    if not isinstance(p['created_at'], datetime):
-                        p['created_at'] = datetime.fromisoformat(str(p['created_at']))
-                if 'updated_at' in p and p['updated_at']:
-                    if not isinstance(p['updated_at'], datetime):
-                        p['updated_at'] = datetime.fromisoformat(str(p['updated_at']))
-        
-        response_data = {
-            "data": product_data,
-            "total_count": total_count,
-            "page": query.page,
-            "limit": query.limit
-        }
-        
-        # Cache result asynchronously without waiting
-        try:
-            serialized_data = msgpack.packb(response_data, default=encode_datetime)
-            # Don't await here - fire and forget to improve response time
-            asyncio.create_task(set_to_cache(
-                redis_client, 
-                cache_key, 
-                serialized_data,
-                CACHE_TTL_SECONDS
-            ))
-        except Exception:
-            # Continue without caching on error
-            pass
+                # Add timing information
+                process_time = (time.perf_counter_ns() - start_time) / 1e6
+                return Response(
+                    content=body,
+                    media_type="application/json",
+                    headers={"X-Cache": cache_status, "X-Process-Time-Ms": f"{process_time:.2f}"}
+                )
         
-        result = PaginatedProducts(**response_data)
+        # Only one request per key goes to the database at a time; concurrent
+        # misses for the same page wait for its result instead
+        body = await single_flight(
+            cache_key, lambda: load_products(db, redis_client, query, cursor, cache_key)
+        )
         
         # Add timing information
-        process_time = (datetime.now() - start_time).total_seconds() * 1000
-        response.headers["X-Process-Time-Ms"] = f"{process_time:.2f}"
-        
-        return result
+        process_time = (time.perf_counter_ns() - start_time) / 1e6
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={"X-Cache": "MISS", "X-Process-Time-Ms": f"{process_time:.2f}"}
+        )
         
     except Exception as e:
         # Log the error but don't expose details
@@ -0,0 +1,87 @@
+from redis.asyncio import Redis
+import zstandard as zstd
+import asyncio
+import struct
+import time
+from typing import List, Optional, Tuple
+
+# Cache writes are queued and flushed to Redis by background workers, so
+# compressing and storing a response never adds to a request's latency.
+# When the queue is full, writes are dropped - the next miss retries them.
+CACHE_QUEUE_SIZE = 1024
+CACHE_WRITER_COUNT = 2
+CACHE_WRITE_BATCH_SIZE = 64
+
+# Pending writes: (key, value, ttl, compress, generated_at)
+cache_queue: Optional[asyncio.Queue] = None
+_writers: List[asyncio.Task] = []
+
+# Cached payloads are the JSON response body wrapped in a zstd frame, so a
+# hit can be sent back as-is without going through Pydantic again. The frame
+# is prefixed with the time the body was generated, which lets readers tell
+# how stale an entry is.
+_GENERATED_AT = struct.Struct("!d")
+_compressor = zstd.ZstdCompressor(level=3)
+_decompressor = zstd.ZstdDecompressor()
+
+def pack_body(body: bytes, generated_at: float) -> bytes:
+    """Compress a serialized response body for Redis"""
+    return _GENERATED_AT.pack(generated_at) + _compressor.compress(body)
+
+def unpack_body(raw: bytes) -> Tuple[bytes, float]:
+    """Return a cached response body and the time it was generated"""
+    (generated_at,) = _GENERATED_AT.unpack_from(raw)
+    return _decompressor.decompress(raw[_GENERATED_AT.size:]), generated_at
+
+async def get_from_cache(redis_client: Optional[Redis], cache_key: str) -> Optional[bytes]:
+    """Get data from cache with optimized error handling"""
+    if redis_client is None:
+        return None
+    try:
+        # Timeouts are enforced by the pool's socket_timeout
+        return await redis_client.get(cache_key)
+    except Exception:
+        # Simplified error handling - just return None on any error
+        return None
+
+def queue_cache_write(cache_key: str, value: bytes, ttl: int, compress: bool = True) -> None:
+    """Hand a value to the cache writers without waiting for it to be stored"""
+    if cache_queue is None:
+        return
+    try:
+        cache_queue.put_nowait((cache_key, value, ttl, compress, time.time()))
+    except asyncio.QueueFull:
+        # Caching is a performance optimization, not critical
+        pass
+
+async def cache_writer(queue: asyncio.Queue, redis_client: Redis) -> None:
+    """Drain the queue, writing whatever is pending in one pipelined round trip"""
+    while True:
+        batch: List[Tuple[str, bytes, int, bool, float]] = [await queue.get()]
+        while len(batch) < CACHE_WRITE_BATCH_SIZE and not queue.empty():
+            batch.append(queue.get_nowait())
+
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for cache_key, value, ttl, compress, generated_at in batch:
+                    if compress:
+                        value = pack_body(value, generated_at)
+                    pipe.set(cache_key, value, ex=ttl)
+                await pipe.execute()
+        except Exception:
+            # Silently continue on error - caching is a performance optimization, not critical
+            pass
+
+def start_cache_writers(redis_client: Redis) -> None:
+    global cache_queue
+    cache_queue = asyncio.Queue(maxsize=CACHE_QUEUE_SIZE)
+    for _ in range(CACHE_WRITER_COUNT):
+        _writers.append(asyncio.create_task(cache_writer(cache_queue, redis_client)))
+
+async def stop_cache_writers() -> None:
+    global cache_queue
+    cache_queue = None
+    for task in _writers:
+        task.cancel()
+    await asyncio.gather(*_writers, return_exceptions=True)
+    _writers.clear()
@@ -1,20 +1,20 @@
-from pydantic_settings import BaseSettings
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
+from functools import lru_cache
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
+    # Values are read from the environment and .env by BaseSettings itself
+
     # Original database URL for synchronous operations
-    DATABASE_URL: str = os.getenv("DATABASE_URL")
-    
+    DATABASE_URL: str
+
     # PostgreSQL connection parameters
-    POSTGRES_HOST: str = os.getenv("POSTGRES_HOST", "localhost")
-    POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
-    POSTGRES_USER: str = os.getenv("POSTGRES_USER", "postgres")
-    POSTGRES_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "")
-    POSTGRES_DB: str = os.getenv("POSTGRES_DB", "postgres")
-    
+    POSTGRES_HOST: str = "localhost"
+    POSTGRES_PORT: str = "5432"
+    POSTGRES_USER: str = "postgres"
+    POSTGRES_PASSWORD: str = ""
+    POSTGRES_DB: str = "postgres"
+
     # Convert standard PostgreSQL URL to async format
     @property
     def ASYNC_DATABASE_URL(self) -> str:
@@ -22,24 +22,47 @@ class Settings(BaseSettings):
         if self.DATABASE_URL.startswith("postgresql://"):
             return self.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
         return self.DATABASE_URL
-    
+
     # Redis configuration
-    REDIS_HOST: str = os.getenv("REDIS_HOST")
-    REDIS_PORT: int = int(os.getenv("REDIS_PORT", "19719"))
-    REDIS_PASSWORD: str = os.getenv("REDIS_PASSWORD", None)
-    REDIS_URL: str = os.getenv("REDIS_URL")
-    
-    # Database connection pool settings
-    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", "20"))
-    DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
-    
+    REDIS_HOST: Optional[str] = None
+    REDIS_PORT: int = 19719
+    REDIS_PASSWORD: Optional[str] = None
+    REDIS_URL: Optional[str] = None
+    REDIS_MAX_CONNECTIONS: int = 64
+    # Connections opened per worker at startup; the rest are opened on demand
+    REDIS_WARM_CONNECTIONS: int = 10
+    REDIS_SOCKET_TIMEOUT: float = 3.0
+
+    # Database connection pool settings, per worker process. Size them from
+    # the concurrent requests each worker should handle: across the
+    # deployment, workers x (DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW) must
+    # stay below Postgres max_connections minus its reserved slots.
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+    # Seconds a request waits for a free connection before failing
+    DATABASE_POOL_TIMEOUT: int = 30
+    # Recycle connections instead of probing each checkout with SELECT 1;
+    # keep this below the idle timeout of any proxy or load balancer on the way
+    DATABASE_POOL_RECYCLE: int = 900
+    DATABASE_POOL_PRE_PING: bool = False
+    # Prepared statements kept per connection; set to 0 behind pgbouncer in
+    # transaction pooling mode, where statements can't outlive a transaction
+    DATABASE_STATEMENT_CACHE_SIZE: int = 500
+
     # Cache settings
-    CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", "600"))
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
-        # Add extra to allow Pydantic v2 to accept additional fields
-        extra = "ignore"  # This will ignore extra fields instead of failing
-
-settings = Settings()
+    CACHE_TTL_SECONDS: int = 30
+    COUNT_CACHE_TTL_SECONDS: int = 60
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=True,
+        # Ignore unrelated variables in the environment or .env file
+        extra="ignore"
+    )
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build the settings once per process"""
+    return Settings()
+
+settings = get_settings()
@@ -1,24 +1,50 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
-from redis.asyncio import Redis as AsyncRedis, ConnectionPool
-from app.db.base import Base, SessionLocal
+from redis.asyncio import Redis as AsyncRedis, BlockingConnectionPool
+from app.db.base import async_engine, AsyncSessionLocal
 from app.core.config import settings
+from app.core.cache import start_cache_writers, stop_cache_writers
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI
 import asyncio
+import logging
 
-async_engine = create_async_engine(
-    settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
-    echo=False,
-    pool_pre_ping=True,
-    pool_size=settings.DATABASE_POOL_SIZE,
-    max_overflow=settings.DATABASE_MAX_OVERFLOW,
-    pool_recycle=3600  # Recycle connections after an hour
-)
+logger = logging.getLogger(__name__)
 
-AsyncSessionLocal = sessionmaker(
-    autocommit=False, autoflush=False, bind=async_engine, class_=AsyncSession
-)
+async def warm_database_pool() -> None:
+    """
+    Open the pool's connections up front so the first requests after startup
+    don't each pay for a connection handshake.
+    """
+    results = await asyncio.gather(
+        *(async_engine.connect() for _ in range(async_engine.pool.size())),
+        return_exceptions=True
+    )
+    # Return the connections that did open before reporting any failure
+    await asyncio.gather(*(
+        conn.close() for conn in results if not isinstance(conn, BaseException)
+    ))
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+async def warm_redis_pool(pool: BlockingConnectionPool) -> None:
+    """Connect the first REDIS_WARM_CONNECTIONS slots of the Redis pool"""
+    count = min(settings.REDIS_WARM_CONNECTIONS, pool.max_connections)
+    results = await asyncio.gather(
+        *(pool.get_connection("PING") for _ in range(count)),
+        return_exceptions=True
+    )
+    conns = [conn for conn in results if not isinstance(conn, BaseException)]
+    try:
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        for conn in conns:
+            await conn.send_command("PING")
+            await conn.read_response()
+    finally:
+        # Hand every connection that did open back to the pool
+        for conn in conns:
+            await pool.release(conn)
 
 async def get_async_db():
     db = AsyncSessionLocal()
@@ -28,48 +54,68 @@ async def get_async_db():
         await db.close()
 
 
-# Global variable to hold the connection pool
-redis_pool = None
-
+async def _initialize_redis_pool(connection_url: str) -> BlockingConnectionPool:
+    """Create the Redis pool and check that it responds"""
+    # A blocking pool makes requests wait briefly for a free connection
+    # instead of failing when all of them are busy
+    pool = BlockingConnectionPool.from_url(
+        connection_url,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        # Cached values are response bodies sent back byte for byte; never
+        # decode them to str
+        decode_responses=False,
+        timeout=2,  # Seconds to wait for a free connection
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_keepalive=True
+    )
+    try:
+        # Test the connection
+        await asyncio.wait_for(AsyncRedis(connection_pool=pool).ping(), timeout=5.0)
+    except Exception:
+        await pool.aclose()
+        raise
+    return pool
 
 @asynccontextmanager
 async def redis_lifespan(app: FastAPI):
     """
     Context manager for Redis connection pool lifespan.
-    Initializes the pool on startup and closes it on shutdown.
+    Initializes the pool once on startup and closes it on shutdown, so
+    requests only ever read it from app.state. Tests can swap in another
+    client (or None) by setting app.state.redis after startup.
     """
-    global redis_pool
-    print("Initializing Redis connection pool...")
+    app.state.redis_pool = None
+    # Shared by every request; the client itself holds no connection state
+    app.state.redis = None
+    logger.debug("Initializing Redis connection pool")
     try:
-        # Create connection pool without the timeout parameter
-        connection_url = f"redis://default:{settings.REDIS_PASSWORD}@{settings.REDIS_HOST}:{settings.REDIS_PORT}"
-        redis_pool = ConnectionPool.from_url(
-            connection_url,
-            max_connections=20  # Set appropriate max connections
+        connection_url = settings.REDIS_URL or (
+            f"redis://default:{settings.REDIS_PASSWORD}@{settings.REDIS_HOST}:{settings.REDIS_PORT}"
         )
-        # Test the connection
-        client = AsyncRedis(connection_pool=redis_pool)
-        await asyncio.wait_for(client.ping(), timeout=5.0)
-        print("Redis connection pool created and connection successful.")
+        app.state.redis_pool = await _initialize_redis_pool(connection_url)
+        app.state.redis = AsyncRedis(connection_pool=app.state.redis_pool)
+        logger.info("Redis connection pool created and connection successful")
+        start_cache_writers(app.state.redis)
     except Exception as e:
-        print(f"Failed to connect to Redis or create pool: {e}")
-        redis_pool = None
+        logger.warning("Failed to connect to Redis or create pool: %s", e)
         # Don't raise an exception - allow app to start without Redis
 
+    if app.state.redis_pool:
+        try:
+            await warm_redis_pool(app.state.redis_pool)
+        except Exception as e:
+            # The pool still works; its connections are opened on demand instead
+            logger.warning("Failed to warm up Redis connection pool: %s", e)
+
     yield
     # Shutdown: Disconnect the pool
-    if redis_pool:
-        print("Closing Redis connection pool...")
-        redis_pool.disconnect()
-        print("Redis connection pool closed.")
-async def get_redis() -> AsyncRedis:
-    """
-    Dependency that provides an async Redis client using the shared pool.
-    Falls back gracefully if Redis is unavailable.
-    """
-    if redis_pool is None:
-        # Return a mock Redis client that does nothing
-        return None
-    
-    # Create a client instance using the shared pool for this request
-    return AsyncRedis(connection_pool=redis_pool)
\ No newline at end of file
+    if app.state.redis_pool:
+        logger.debug("Closing Redis connection pool")
+        try:
+            await stop_cache_writers()
+            await app.state.redis.aclose()
+            await app.state.redis_pool.aclose()
+            logger.debug("Redis connection pool closed")
+        except asyncio.CancelledError:
+            # Shutdown was interrupted (e.g. a second SIGTERM); let it finish
+            pass
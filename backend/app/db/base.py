@@ -1,29 +1,40 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase
 from app.core.config import settings
 
-# Create synchronous engine
-engine = create_engine(settings.DATABASE_URL)
-
 # Create async engine (will use asyncpg driver)
 async_engine = create_async_engine(
-    settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
+    settings.ASYNC_DATABASE_URL,
     echo=False,
-    pool_pre_ping=True,
-    pool_size=20,
-    max_overflow=10
+    pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+    pool_recycle=settings.DATABASE_POOL_RECYCLE,
+    # Reuse the most recently returned connection, so surplus ones stay idle
+    # and get recycled instead of all being kept warm
+    pool_use_lifo=True,
+    connect_args={
+        # Hot queries are parsed and planned once per connection, then
+        # reused as server-side prepared statements
+        "prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+        "statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+        # The product queries are short index scans; JIT compiling them
+        # costs more planning time than it ever saves
+        "server_settings": {
+            "jit": "off",
+            # TCP keepalives detect dead connections without a pre-ping
+            "tcp_keepalives_idle": "60"
+        }
+    }
 )
 
-# Synchronous Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Asynchronous Session factory
-AsyncSessionLocal = sessionmaker(
-    autocommit=False,
+# Asynchronous Session factory. Sessions are read-mostly, so loaded objects
+# aren't expired on commit and re-fetched on the next attribute access.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
     autoflush=False,
-    bind=async_engine,
-    class_=AsyncSession
+    expire_on_commit=False
 )
 
 # Base class
@@ -1,38 +1,59 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from app.api.v1.endpoints import products
-from app.db.base import Base, engine, async_engine
 from fastapi.middleware.cors import CORSMiddleware
-from app.core.dependencies import redis_lifespan
-from app.models.product import Product
+from app.core.dependencies import redis_lifespan, warm_database_pool
+from app.db.base import async_engine
+from contextlib import asynccontextmanager
 import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tables and indexes are created by scripts/migrate.py at deploy time, so
+# worker startup only has to open connections
+async def setup_database():
+    try:
+        await warm_database_pool()
+        logger.debug("Database connection pool warmed up")
+    except Exception as e:
+        # Connections will be opened on demand instead
+        logger.warning("Failed to warm up database connection pool: %s", e)
+
+# on_event("startup") handlers are ignored when a lifespan is set, so startup
+# work runs here before the Redis lifespan takes over
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await setup_database()
+    try:
+        async with redis_lifespan(app):
+            yield
+    finally:
+        # Close pooled asyncpg connections so reloads don't leak them
+        await async_engine.dispose()
 
 app = FastAPI(
     title="Mirtech - High-Performance Data Table API",
     description="FastAPI backend for handling 100,000+ records",
     version="1.0.0",
-    lifespan=redis_lifespan
+    lifespan=lifespan,
+    # Routes that return plain data are serialized with orjson
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000","https://api-mirtech.vercel.app", "https://mirtech.vercel.app" ,"http://127.0.0.1:8000"],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # The API is read-only; explicit lists avoid echoing whatever a
+    # preflight asks for, and browsers may cache preflights for a day
+    allow_methods=["GET"],
+    allow_headers=["Authorization", "Content-Type", "Accept"],
+    max_age=86400,
 )
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-
-# Initialize database optimizations
-@app.on_event("startup")
-async def setup_database():
-    # Create full-text search indexes
-    await Product.create_text_search_index(async_engine)
-    print("Database optimizations applied")
-
 app.include_router(products.router, prefix="/api/v1", tags=["products"])
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to Mirtech - The High-Performance Data Table API"}
\ No newline at end of file
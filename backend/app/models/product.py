@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Index, text
+from sqlalchemy import Column, Integer, String, Float, DateTime, text
 from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.sql.expression import FunctionElement
 from app.db.base import Base
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Custom GIN index for full-text search if PostgreSQL
 class tsvector(FunctionElement):
@@ -24,23 +27,11 @@ class Product(Base):
     created_at = Column(DateTime, index=True)
     updated_at = Column(DateTime)
     
-    # Create composite indexes for common query patterns
-    __table_args__ = (
-        # Index for category + sorting by price
-        Index('idx_category_price', category, price),
-        
-        # Index for category + sorting by name
-        Index('idx_category_name', category, name),
-        
-        # Index for pagination + sorting
-        Index('idx_created_at_id', created_at, id),
-    )
-    
     @classmethod
     async def create_text_search_index(cls, engine):
         """
-        Creates a GIN index for full-text search on PostgreSQL
-        Call this method during application startup
+        Creates the full-text search setup and the query indexes on PostgreSQL
+        Call this method from scripts/migrate.py
         """
         # SQL to create a GIN index for full-text search
         sql = """
@@ -59,7 +50,8 @@ class Product(Base):
                 CREATE INDEX idx_products_search_vector ON products USING GIN (search_vector);
                 
                 -- Create a trigger to update the tsvector column
-                CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+                -- The body uses its own dollar-quote tag so it doesn't end the DO block
+                CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $fn$
                 BEGIN
                     NEW.search_vector := to_tsvector('english', 
                         coalesce(NEW.name, '') || ' ' || 
@@ -68,7 +60,7 @@ class Product(Base):
                     );
                     RETURN NEW;
                 END
-                $$ LANGUAGE plpgsql;
+                $fn$ LANGUAGE plpgsql;
                 
                 -- Create trigger
                 CREATE TRIGGER products_search_vector_update_trigger
@@ -86,7 +78,41 @@ class Product(Base):
         $$;
         """
         
-        # Execute the SQL to create the index
+        # Indexes are built CONCURRENTLY so a migration against a live table
+        # doesn't block writes. Should a build fail, Postgres leaves an
+        # INVALID index behind that IF NOT EXISTS skips; drop it and rerun.
+        index_sql = [
+            # Index for category + sorting by price
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_category_price ON products (category, price);",
+            
+            # Index for category + sorting by name
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_category_name ON products (category, name);",
+            
+            # Index for pagination + sorting
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_created_at_id ON products (created_at, id);",
+            
+            # Expression index backing the name search in the products endpoint;
+            # queries must use this exact to_tsvector(...) expression to hit it
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS products_name_fts
+            ON products USING GIN (to_tsvector('english', name));
+            """,
+            
+            # Trigram index for wildcard (LIKE) name searches
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+            """
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS products_name_trgm
+            ON products USING GIN (lower(name) gin_trgm_ops);
+            """,
+        ]
+        
+        # Execute the SQL to create the search vector setup
         async with engine.begin() as conn:
             await conn.execute(text(sql))
-            print("Full-text search index created or verified")
\ No newline at end of file
+        
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for stmt in index_sql:
+                await conn.execute(text(stmt))
+        logger.info("Full-text search and query indexes created or verified")
\ No newline at end of file
@@ -1,7 +1,10 @@
-from pydantic import BaseModel, validator, Field
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, field_validator, Field
+from typing import Optional, List, Literal
 from datetime import datetime
 
+# Columns the product listing can be sorted by
+SortField = Literal["id", "name", "price", "category", "stock_quantity", "created_at", "updated_at"]
+
 class ProductQuery(BaseModel):
     """
     Query parameters for product listings endpoint
@@ -10,25 +13,17 @@ class ProductQuery(BaseModel):
     """
     page: int = Field(default=1, ge=1, description="Page number (minimum 1)")
     limit: int = Field(default=50, ge=1, le=100, description="Items per page (between 1 and 100)")
-    sort_by: str = Field(default="id", description="Field to sort results by")
-    sort_order: str = Field(default="asc", description="Sort direction (asc or desc)")
+    sort_by: SortField = Field(default="id", description="Field to sort results by")
+    sort_order: Literal["asc", "desc"] = Field(default="asc", description="Sort direction (asc or desc)")
     category: Optional[str] = Field(default=None, description="Filter by product category")
     search: Optional[str] = Field(default=None, description="Search term")
+    after: Optional[str] = Field(
+        default=None,
+        description="Cursor from a previous response's next_cursor; takes precedence over page"
+    )
 
-    @validator("sort_by")
-    def sort_by_must_be_valid(cls, v):
-        valid_fields = ["id", "name", "price", "category", "stock_quantity", "created_at", "updated_at"]
-        if v not in valid_fields:
-            raise ValueError(f"Sort_by must be one of {valid_fields}")
-        return v
-
-    @validator("sort_order")
-    def sort_order_must_be_valid(cls, v):
-        if v not in ["asc", "desc"]:
-            raise ValueError("Sort_order must be 'asc' or 'desc'")
-        return v
-        
-    @validator("category")
+    @field_validator("category", mode="after")
+    @classmethod
     def validate_category(cls, v):
         if v is not None:
             if len(v.strip()) == 0:
@@ -37,7 +32,8 @@ class ProductQuery(BaseModel):
                 raise ValueError("Category value is too long (max 50 characters)")
         return v
     
-    @validator("search")
+    @field_validator("search", mode="after")
+    @classmethod
     def validate_search(cls, v):
         if v is not None:
             if len(v.strip()) == 0:
@@ -47,6 +43,8 @@ class ProductQuery(BaseModel):
         return v
 
 class ProductOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     name: str
     description: str
@@ -56,11 +54,11 @@ class ProductOut(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True  # Correct for Pydantic 2.x with SQLAlchemy
-
 class PaginatedProducts(BaseModel):
     data: List[ProductOut]
-    total_count: int
+    # Not computed for cursor (after=...) requests
+    total_count: Optional[int]
     page: int
-    limit: int
\ No newline at end of file
+    limit: int
+    has_next: bool
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,14 @@
+import uvicorn
+
+if __name__ == "__main__":
+    # uvloop and httptools replace the pure-Python event loop and HTTP
+    # parser; the Docker image gets the same through gunicorn's UvicornWorker,
+    # which picks them up automatically when installed. The worker count is
+    # read from WEB_CONCURRENCY (default 1).
+    uvicorn.run(
+        "app.main:app",
+        host="127.0.0.1",
+        port=8000,
+        loop="uvloop",
+        http="httptools"
+    )
@@ -0,0 +1,22 @@
+import asyncio
+import time
+from app.db.base import Base, async_engine
+from app.models.product import Product
+
+async def migrate():
+    start_time = time.time()
+
+    # Create tables
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    # Create full-text search indexes
+    await Product.create_text_search_index(async_engine)
+
+    await async_engine.dispose()
+
+    end_time = time.time()
+    print(f"Database schema migrated in {end_time - start_time:.2f} seconds.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -240,7 +240,11 @@ export function ProductTable() {
   const { table } = useDataTable({
     data: data?.data || [],
     columns,
-    pageCount: data ? Math.ceil(data.total_count / data.limit) : 1,
+    pageCount: data
+      ? data.total_count !== null
+        ? Math.ceil(data.total_count / data.limit)
+        : data.page + (data.has_next ? 1 : 0)
+      : 1,
     manualPagination: true,
     manualSorting: true,
     onPaginationChange: handlePaginationChange,
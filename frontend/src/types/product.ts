@@ -11,9 +11,12 @@ export interface Product {
 
 export interface PaginatedProducts {
   data: Product[];
-  total_count: number;
+  // null for cursor (after=...) requests, which skip the count
+  total_count: number | null;
   page: number;
   limit: number;
+  has_next: boolean;
+  next_cursor: string | null;
 }
 
 export interface ProductQueryParams {